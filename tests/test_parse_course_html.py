@@ -0,0 +1,108 @@
+import importlib
+import os
+import sys
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope="module")
+def yum(tmp_path_factory):
+    # Importing yum creates public/<date>/ in the working directory, so do it somewhere disposable
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("crawl"))
+    try:
+        return importlib.import_module("yum")
+    finally:
+        os.chdir(cwd)
+
+
+def parse(yum, table_html: str):
+    html = f'<html><body><div id="dersProgramContainer">{table_html}</div></body></html>'
+    return yum._parse_course_html(html.encode(), "utf-8")
+
+
+def read_html_reference(yum, html: str):
+    """What the original pd.read_html-based crawler produced, as it would be written to CSV."""
+    df = pd.read_html(StringIO(html))[0]
+    df.columns = [str(col).translate(yum._COL_TRANS).strip() for col in df.columns]
+    return pd.read_csv(StringIO(df.to_csv(index=True)), dtype=str, keep_default_na=False)
+
+
+def as_written(df):
+    return pd.read_csv(StringIO(df.to_csv(index=True)), dtype=str, keep_default_na=False)
+
+
+def test_saved_page_matches_read_html(yum):
+    body = (FIXTURES / "DersProgramSearch_BBF.html").read_bytes()
+    df = yum._parse_course_html(body, "utf-8")
+    reference = read_html_reference(yum, body.decode("utf-8"))
+
+    pd.testing.assert_frame_equal(as_written(df), reference)
+
+
+def test_br_separated_values(yum):
+    body = (FIXTURES / "DersProgramSearch_BBF.html").read_bytes()
+    df = yum._parse_course_html(body, "utf-8")
+
+    assert "Reservation Maj./Cap./Enrl." in df.columns
+    row = df[df["CRN"] == "23980"].iloc[0]
+    assert row["Instructor"] == "Behçet Uğur Töreyin , Ahmet Hamdi Kayran"
+    assert row["Building"] == "BBB BBB"
+    assert row["Day"] == "Wednesday Friday"
+    assert row["Time"] == "08:30/10:29 14:00/15:59"
+
+
+def test_table_without_th_uses_positional_columns(yum):
+    df = parse(yum, "<table><tr><td>a</td><td>b</td></tr><tr><td>1</td><td>2</td></tr></table>")
+
+    assert list(df.columns) == ["0", "1"]
+    assert df.values.tolist() == [["a", "b"], ["1", "2"]]
+
+
+def test_colspan_header_is_deduplicated(yum):
+    df = parse(yum, "<table><thead><tr><th colspan=2>Time</th><th>Room</th></tr></thead>"
+                    "<tbody><tr><td>08:30</td><td>10:29</td><td>A1</td></tr></tbody></table>")
+
+    assert list(df.columns) == ["Time", "Time.1", "Room"]
+    assert df.values.tolist() == [["08:30", "10:29", "A1"]]
+
+
+def test_rowspan_is_carried_down(yum):
+    df = parse(yum, "<table><thead><tr><th>CRN</th><th>Day</th><th>Time</th></tr></thead>"
+                    "<tbody><tr><td rowspan=2>23980</td><td>Wednesday</td><td>08:30</td></tr>"
+                    "<tr><td>Friday</td><td>14:00</td></tr></tbody></table>")
+
+    assert df.values.tolist() == [["23980", "Wednesday", "08:30"], ["23980", "Friday", "14:00"]]
+
+
+def test_ragged_rows_are_padded(yum):
+    df = parse(yum, "<table><thead><tr><th>CRN</th><th>Day</th></tr></thead>"
+                    "<tbody><tr><td>1</td><td>2</td><td>3</td></tr>"
+                    "<tr><td colspan=2>No courses</td></tr></tbody></table>")
+
+    assert list(df.columns) == ["CRN", "Day", "Unnamed: 2"]
+    assert df.values.tolist() == [["1", "2", "3"], ["No courses", "No courses", ""]]
+
+
+def test_missing_container_returns_none(yum):
+    assert yum._parse_course_html(b"<html><body><table><tr><td>x</td></tr></table></body></html>", "utf-8") is None
+
+
+def test_cell_texts_do_not_reference_the_tree(yum):
+    # _parse_course_html frees the lxml tree before building the DataFrame, which
+    # only helps if no cell text keeps an element (and so the document) alive
+    body = (FIXTURES / "DersProgramSearch_BBF.html").read_bytes()
+    table = yum.lxml.html.fromstring(body).xpath("//div[@id='dersProgramContainer']//table[1]")[0]
+    yum._prepare_table(table)
+    header, remainder = yum._expand_spans(table.xpath("./thead/tr"))
+    rows, _ = yum._expand_spans(table.xpath("./tbody/tr"), remainder)
+
+    assert {type(text) for texts in header + rows for text in texts} == {str}
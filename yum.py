@@ -1,11 +1,14 @@
 import argparse
 import asyncio
-import json
+import concurrent.futures
 import os
+import random
+import re
 from datetime import datetime
-from io import StringIO
 
 import aiohttp
+import lxml.html
+import orjson
 import pandas as pd
 from tqdm import tqdm
 
@@ -20,14 +23,30 @@ PROGRAM_LEVELS = {
 }
 BASE_URL = "https://obs.itu.edu.tr/public/DersProgram"
 MAX_RETRIES = 3
-RETRY_DELAY = 1  # seconds
-MAX_CONCURRENT_REQUESTS = 10  
+RETRY_DELAY = 1  # seconds, doubled on every retry
+RETRY_JITTER = 0.5  # seconds of random jitter added to each retry delay
+MAX_RETRY_AFTER = 4 * (RETRY_DELAY << MAX_RETRIES)  # seconds, cap on server-requested waits
+# Concurrency adapts between these bounds (AIMD), starting at INITIAL_CONCURRENT_REQUESTS
+INITIAL_CONCURRENT_REQUESTS = 10
+MIN_CONCURRENT_REQUESTS = 4
+MAX_CONCURRENT_REQUESTS = 64
+# Status code the server uses for rate limiting; every 5xx is treated as overload too
+TOO_MANY_REQUESTS = 429
+# Status codes that will not change on retry
+NON_RETRYABLE_STATUSES = (400, 404)
+# Maximum number of CSV files handed to the writer thread at once
+WRITE_BATCH_SIZE = 32
 
 # Headers to request English version
 HEADERS = {
     'Accept-Language': 'en-US,en;q=0.9,tr-TR;q=0.8,tr;q=0.7'
 }
 
+# Collapse newlines and runs of whitespace inside cells, as pandas.read_html did
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+# Single-pass translation table for cleaning up column names
+_COL_TRANS = str.maketrans({",": ";", "\n": " ", "\r": ""})
+
 if not os.path.exists(FOLDER_PATH):
     os.makedirs(FOLDER_PATH)
 
@@ -37,157 +56,375 @@ if not os.path.exists(FOLDER_PATH + "/" + DATE):
 
 def exportJson(path: str, list: list):
     list = [{"value": v, "label": v} for v in list]
-    with open(path, "w") as f:
-        json.dump(list, f)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(list))
+
+
+def _cell_text(cell) -> str:
+    """Return the normalized text content of a table cell."""
+    return _RE_WHITESPACE.sub(" ", cell.text_content().strip())
+
+
+def _expand_spans(rows, remainder=None):
+    """Return the cell texts of each row, repeating colspan cells across columns and rowspan cells down rows.
+
+    Mirrors pd.read_html; ``remainder`` carries rowspans still open from the previous section.
+    """
+    all_texts = []
+    remainder = remainder or []  # (column index, text, rows left) for cells spanning into this row
+    for row in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for cell in row.xpath("./td|./th"):
+            # Fill in cells from earlier rows that span into this one before this cell
+            while remainder and remainder[0][0] <= index:
+                prev_index, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+                index += 1
+            
+            text = _cell_text(cell)
+            rowspan = int(cell.get("rowspan") or 1)
+            colspan = int(cell.get("colspan") or 1)
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+        
+        # Spanning cells after the last cell of this row
+        for prev_index, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+        
+        all_texts.append(texts)
+        remainder = next_remainder
+    return all_texts, remainder
+
+
+def _dedupe_columns(names: list) -> list:
+    """Make column names unique the way pandas does ("Time", "Time.1", ...)."""
+    seen = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(name if count == 0 else f"{name}.{count}")
+    return unique
+
+
+def _prepare_table(table):
+    """Apply pd.read_html's preprocessing to a table element in place."""
+    # <br> separates values (e.g. multi-session days and times)
+    for br in table.xpath(".//br"):
+        br.tail = "\n" + (br.tail or "")
+    # Hidden elements are not part of the table
+    for elem in table.xpath(".//style"):
+        elem.drop_tree()
+    for elem in table.xpath(".//*[@style]"):
+        if "display:none" in elem.get("style", "").replace(" ", ""):
+            elem.drop_tree()
+
+
+def _parse_course_html(body: bytes, encoding: str):
+    """Parse the course table from a DersProgramSearch response (runs in a worker process)."""
+    # Parse the raw bytes directly with lxml, skipping a decode to str
+    # text_content() extracts text from links as well
+    doc = lxml.html.fromstring(body, parser=lxml.html.HTMLParser(encoding=encoding))
+    tables = doc.xpath("//div[@id='dersProgramContainer']//table[1]")
+    if not tables:
+        return None
+    
+    table = tables[0]
+    _prepare_table(table)
+    
+    # Header rows come from <thead>, or else from leading rows made only of <th>
+    header_rows = table.xpath("./thead/tr")
+    body_rows = table.xpath("./tbody/tr|./tr|./tfoot/tr")
+    if not header_rows:
+        while body_rows and all(cell.tag == "th" for cell in body_rows[0].xpath("./td|./th")):
+            header_rows.append(body_rows.pop(0))
+    header, remainder = _expand_spans(header_rows)
+    rows, _ = _expand_spans(body_rows, remainder)
+    # Free the parsed tree before building the DataFrame to keep peak memory down.
+    # These are the last references to it: the cell texts are plain str copies
+    del doc, tables, table, header_rows, body_rows
+    
+    # Pad every row to the widest one; columns without a header get pandas' "Unnamed: i"
+    # names, and a table without any header gets positional integer columns
+    width = max([len(texts) for texts in header + rows] or [0])
+    rows = [texts + [None] * (width - len(texts)) for texts in rows]
+    if header:
+        names = header[0] + [""] * (width - len(header[0]))
+        columns = _dedupe_columns([name or f"Unnamed: {i}" for i, name in enumerate(names)])
+    else:
+        columns = list(range(width))
+    df = pd.DataFrame(rows, columns=columns)
+    
+    # Clean up column names:
+    # - Replace commas with semicolons to match original format
+    # - Normalize newlines and carriage returns (e.g., "Reservation\nMaj./Cap./Enrl.")
+    # - Strip whitespace
+    df.columns = [str(col).translate(_COL_TRANS).strip() for col in df.columns]
+    
+    # Clean up data: blank out missing cells and strip whitespace from all string columns
+    obj_cols = df.select_dtypes(include='object').columns
+    df[obj_cols] = df[obj_cols].fillna('').apply(lambda s: s.str.strip())
+    
+    return df
+
+
+class ServiceOverloadError(Exception):
+    """Raised when the server signals overload (HTTP 429/5xx or refused connections)."""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """Concurrency limiter that grows additively on success and halves on overload (AIMD)."""
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        # Completed requests so far, and the count by which every request that was
+        # in flight at the last decrease has finished. Overload errors up to that
+        # point belong to the same window and must not halve the limit again
+        self._completed = 0
+        self._window_end = 0
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._completed += 1
+            if exc_type is None:
+                # Roughly +1 slot per full window of successful requests
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif issubclass(exc_type, ServiceOverloadError):
+                if self._completed > self._window_end:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._window_end = self._completed + self._in_flight
+            self._condition.notify_all()
+        return False
+
+
+def _retry_after(headers) -> float:
+    """Return the Retry-After delay in seconds (capped at MAX_RETRY_AFTER), or 0 if missing or not a number."""
+    if not headers:
+        return 0.0
+    try:
+        return min(MAX_RETRY_AFTER, max(0.0, float(headers.get("Retry-After", 0))))
+    except ValueError:
+        return 0.0
+
+
+def _backoff_delay(attempt: int, retry_after: float = 0) -> float:
+    """Exponential backoff with jitter, unless the server asked for a longer wait."""
+    return max(retry_after, RETRY_DELAY * (1 << attempt) + random.random() * RETRY_JITTER)
 
 
 async def fetch_branch_codes(session: aiohttp.ClientSession, program_level: str):
-    """Fetch branch codes and IDs from the API."""
+    """Fetch branch codes and IDs from the API, reusing today's cached copy if present."""
     url = f"{BASE_URL}/SearchBransKoduByProgramSeviye?programSeviyeTipiAnahtari={program_level}"
     
+    # Branch codes rarely change within a day, so re-runs read them from disk
+    cache_path = os.path.join(FOLDER_PATH, DATE, f"_branches_{program_level}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return orjson.loads(f.read())
+    
     for attempt in range(MAX_RETRIES):
         try:
-            async with session.get(url, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            async with session.get(url) as response:
                 response.raise_for_status()
-                return await response.json()
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                body = await response.read()
+            branch_data = orjson.loads(body)
+            
+            # Write to a temporary file first so a crash never leaves a partial cache
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, cache_path)
+            return branch_data
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
             if attempt < MAX_RETRIES - 1:
                 print(f"Retrying branch codes fetch (attempt {attempt + 1}/{MAX_RETRIES})...")
-                await asyncio.sleep(RETRY_DELAY)
+                await asyncio.sleep(_backoff_delay(attempt, _retry_after(getattr(e, "headers", None))))
             else:
                 raise Exception(f"Failed to fetch branch codes after {MAX_RETRIES} attempts: {e}")
 
 
-async def gather_with_progress(coros, desc: str):
-    """Gather async coroutines with tqdm progress bar."""
-    pbar = tqdm(total=len(coros), desc=desc)
-    
-    async def track_progress(coro):
-        try:
-            result = await coro
-            pbar.update(1)
-            return result
-        except Exception as e:
-            pbar.update(1)
-            raise
-    
-    tracked_coros = [track_progress(coro) for coro in coros]
-    results = await asyncio.gather(*tracked_coros, return_exceptions=True)
-    pbar.close()
-    return results
-
-
-async def fetch_course_data(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, program_level: str, branch_id: int, course_code: str):
+async def fetch_course_data(session: aiohttp.ClientSession, limiter: AdaptiveLimiter, executor: concurrent.futures.Executor, program_level: str, branch_id: int, course_code: str):
     """Fetch course data for a specific branch ID."""
     url = f"{BASE_URL}/DersProgramSearch?ProgramSeviyeTipiAnahtari={program_level}&dersBransKoduId={branch_id}"
     
-    async with semaphore:  # Limit concurrent requests
-        for attempt in range(MAX_RETRIES):
+    for attempt in range(MAX_RETRIES):
+        try:
+            # Only the request itself counts against the adaptive limit
+            async with limiter:
+                try:
+                    async with session.get(url) as response:
+                        if response.status == TOO_MANY_REQUESTS or response.status >= 500:
+                            raise ServiceOverloadError(f"HTTP {response.status}", _retry_after(response.headers))
+                        response.raise_for_status()
+                        body = await response.read()
+                        charset = response.charset or "utf-8"
+                except aiohttp.ClientConnectorError as e:
+                    raise ServiceOverloadError(str(e)) from e
+            
+            # Cheap pre-check before handing the page to a worker;
+            # the XPath lookup in _parse_course_html is authoritative
+            if b"dersProgramContainer" not in body:
+                return None, course_code  # No data available
+            
+            # Parse in the process pool so the event loop keeps serving downloads
+            loop = asyncio.get_running_loop()
             try:
-                async with session.get(url, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    response.raise_for_status()
-                    text = await response.text()
-                    
-                    # Check if response contains a table
-                    if "dersProgramContainer" not in text:
-                        return None, course_code  # No data available
-                    
-                    # Parse HTML table using pandas
-                    # pandas.read_html automatically extracts text from links by default
-                    dfs = pd.read_html(StringIO(text))
-                    if not dfs or len(dfs) == 0:
-                        return None, course_code
-                    
-                    df = dfs[0]
-                    
-                    # Clean up column names:
-                    # - Replace commas with semicolons to match original format
-                    # - Normalize newlines and carriage returns (e.g., "Reservation\nMaj./Cap./Enrl.")
-                    # - Strip whitespace
-                    df.columns = [col.replace(",", ";").replace("\n", " ").replace("\r", "").replace("\x0D", "").replace("\x0A", " ").strip() 
-                                 for col in df.columns]
-                    
-                    # Clean up data: strip whitespace from all string columns
-                    for col in df.columns:
-                        if df[col].dtype == 'object':
-                            df[col] = df[col].astype(str).str.strip()
-                            # Replace 'nan' strings with empty strings
-                            df[col] = df[col].replace('nan', '')
-                    
-                    return df, course_code
-            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
-                if attempt < MAX_RETRIES - 1:
-                    await asyncio.sleep(RETRY_DELAY)
-                else:
-                    # Return None if we can't parse (likely no data)
-                    return None, course_code
-
-
-async def process_level(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, program_level: str, level_name: str, filter_courses: set = None):
-    """Process a single program level asynchronously."""
-    print(f"\n{'='*60}")
-    print(f"Processing {level_name} ({program_level})...")
-    print(f"{'='*60}")
-    
-    # Fetch branch codes for this level
-    print(f"Fetching branch codes for {level_name}...")
-    branch_data = await fetch_branch_codes(session, program_level)
-    
+                df = await loop.run_in_executor(executor, _parse_course_html, body, charset)
+            except ValueError:
+                return None, course_code  # Malformed table; downloading it again won't help
+            if df is None:
+                return None, course_code
+            
+            return df, course_code
+        except ServiceOverloadError as e:
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(_backoff_delay(attempt, e.retry_after))
+            else:
+                return None, course_code
+        except aiohttp.ClientResponseError as e:
+            if e.status in NON_RETRYABLE_STATUSES:
+                return None, course_code  # Course is unavailable, retrying won't help
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(_backoff_delay(attempt, _retry_after(e.headers)))
+            else:
+                return None, course_code
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(_backoff_delay(attempt))
+            else:
+                return None, course_code
+
+
+def _flush_batch(batch: list, output_format: str):
+    """Write a batch of (path, DataFrame) pairs as CSV or Parquet files."""
+    for out_path, df in batch:
+        if output_format == "parquet":
+            df.to_parquet(out_path, compression="zstd", index=True)
+        else:
+            df.to_csv(out_path, index=True)
+
+
+async def table_writer(write_queue: asyncio.Queue, output_format: str):
+    """Write queued (path, DataFrame) pairs in batches on a thread until a None sentinel arrives."""
+    loop = asyncio.get_running_loop()
+    batch = []
+    while True:
+        item = await write_queue.get()
+        if item is not None:
+            batch.append(item)
+        # Flush when the batch is full, the queue has run dry, or we are done
+        if batch and (item is None or len(batch) >= WRITE_BATCH_SIZE or write_queue.empty()):
+            await loop.run_in_executor(None, _flush_batch, batch, output_format)
+            batch = []
+        if item is None:
+            return
+
+
+def select_courses(level_name: str, branch_data: list, filter_courses: set = None):
+    """Pick the (branch ID, course code) pairs to fetch for a program level."""
     if not branch_data:
         print(f"No branch codes found for {level_name}, skipping...")
-        return set(), 0
+        return []
     
-    course_codes = [item["dersBransKodu"] for item in branch_data]
-    branch_ids = {item["dersBransKodu"]: item["bransKoduId"] for item in branch_data}
+    # Collect (branch ID, course code) pairs in one pass, filtering by course codes if specified
+    courses = [
+        (item["bransKoduId"], item["dersBransKodu"])
+        for item in branch_data
+        if not filter_courses or item["dersBransKodu"] in filter_courses
+    ]
     
-    # Filter by course codes if specified
     if filter_courses:
-        course_codes = [code for code in course_codes if code in filter_courses]
-        if not course_codes:
+        if not courses:
             print(f"No matching course codes found for {level_name} with filter: {filter_courses}")
-            return set(), 0
-        print(f"Filtered to {len(course_codes)} course codes: {', '.join(course_codes)}")
+            return []
+        print(f"Filtered {level_name} to {len(courses)} course codes: {', '.join(code for _, code in courses)}")
     
-    print(f"Found {len(course_codes)} course codes for {level_name}")
+    print(f"Found {len(courses)} course codes for {level_name}")
+    return courses
+
+
+async def process_level(session: aiohttp.ClientSession, limiter: AdaptiveLimiter, executor: concurrent.futures.Executor, program_level: str, level_name: str, courses: list, pbar: tqdm, output_format: str = "csv"):
+    """Fetch and save the courses of a single program level asynchronously."""
+    # Drain a queue of course fetches with a pool of workers; finished tables go
+    # to a separate writer task so disk I/O never blocks the event loop
+    queue = asyncio.Queue()
+    for course in courses:
+        queue.put_nowait(course)
     
-    # Create tasks for all course fetches
-    tasks = [
-        fetch_course_data(session, semaphore, program_level, branch_ids[course_code], course_code)
-        for course_code in course_codes
-    ]
+    write_queue = asyncio.Queue()
+    writer_task = asyncio.create_task(table_writer(write_queue, output_format))
+    
+    # Save with level prefix (except LS for backward compatibility)
+    # LS files keep original format, other levels get prefix
+    out_dir = os.path.join(FOLDER_PATH, DATE)
+    prefix = "" if program_level == "LS" else f"{program_level}-"
     
-    # Process all courses in parallel with progress bar
     processed_count = 0
-    results = await gather_with_progress(tasks, desc=f"Processing {level_name}")
-    
-    # Save results to CSV files
-    for result in results:
-        # Handle exceptions that might have been returned
-        if isinstance(result, Exception):
-            continue  # Skip failed requests
-        df, course_code = result
-        if df is None or len(df) == 0:
-            continue  # Skip courses with no data
-        
-        # Save to CSV with level prefix (except LS for backward compatibility)
-        # LS files keep original format, other levels get prefix
-        if program_level == "LS":
-            csv_path = os.path.join(FOLDER_PATH, DATE, f"{course_code}.csv")
-        else:
-            csv_path = os.path.join(FOLDER_PATH, DATE, f"{program_level}-{course_code}.csv")
-        df.to_csv(csv_path, index=True)
-        processed_count += 1
     
-    print(f"Processed {processed_count} courses for {level_name}")
-    return set(course_codes), processed_count
+    async def worker():
+        nonlocal processed_count
+        while not queue.empty():
+            branch_id, course_code = queue.get_nowait()
+            try:
+                df, _ = await fetch_course_data(session, limiter, executor, program_level, branch_id, course_code)
+            except Exception:
+                df = None  # Skip courses that failed unexpectedly and keep draining the queue
+            finally:
+                pbar.update(1)
+            if df is None or len(df) == 0:
+                continue  # Skip courses with no data
+            
+            write_queue.put_nowait((f"{out_dir}/{prefix}{course_code}.{output_format}", df))
+            processed_count += 1
+    
+    # Start enough workers for the largest limit; the limiter decides how many run at once
+    await asyncio.gather(*[worker() for _ in range(MAX_CONCURRENT_REQUESTS)])
+    
+    # Signal the writer that no more tables are coming and wait for it to flush
+    write_queue.put_nowait(None)
+    await writer_task
+    
+    # Write through tqdm so the shared progress bar stays intact
+    tqdm.write(f"Processed {processed_count} courses for {level_name}")
+    return processed_count
 
 
 async def main():
     parser = argparse.ArgumentParser(description='Fetch ITU course schedules from API')
     parser.add_argument('--courses', '-c', nargs='+', help='Filter by specific course codes (e.g., BBF AKM)')
     parser.add_argument('--level', '-l', choices=list(PROGRAM_LEVELS.keys()), help='Filter by specific education level')
+    parser.add_argument('--format', '-f', choices=['csv', 'parquet'], default='csv', help='Output file format (the frontend reads csv)')
     args = parser.parse_args()
     
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet requires pyarrow (pip install pyarrow)")
+    
     # Filter course codes if specified
     filter_courses = set(args.courses) if args.courses else None
     filter_level = args.level
@@ -199,15 +436,41 @@ async def main():
     # Process each program level
     levels_to_process = {filter_level: PROGRAM_LEVELS[filter_level]} if filter_level else PROGRAM_LEVELS
     
-    # Create semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    # Adjust concurrency to what the server sustains
+    limiter = AdaptiveLimiter(INITIAL_CONCURRENT_REQUESTS, MIN_CONCURRENT_REQUESTS, MAX_CONCURRENT_REQUESTS)
     
-    # Create aiohttp session
-    async with aiohttp.ClientSession() as session:
-        for program_level, level_name in levels_to_process.items():
-            course_codes, _ = await process_level(session, semaphore, program_level, level_name, filter_courses)
-            course_codes_by_level[program_level].update(course_codes)
-            all_course_codes.update(course_codes)
+    # Parse HTML in worker processes, outside the event loop
+    with concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        # Reuse keep-alive connections to the single host for every request
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONCURRENT_REQUESTS,
+            limit_per_host=MAX_CONCURRENT_REQUESTS,
+            keepalive_timeout=60,
+            ttl_dns_cache=600
+        )
+        async with aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=10)) as session:
+            # Fetch branch codes for every level up front so the progress bar knows the total
+            print(f"Fetching branch codes for {', '.join(levels_to_process.values())}...")
+            branch_data_by_level = await asyncio.gather(*[
+                fetch_branch_codes(session, program_level) for program_level in levels_to_process
+            ])
+            courses_by_level = {
+                program_level: select_courses(level_name, branch_data, filter_courses)
+                for (program_level, level_name), branch_data in zip(levels_to_process.items(), branch_data_by_level)
+            }
+            for program_level, courses in courses_by_level.items():
+                course_codes = {course_code for _, course_code in courses}
+                course_codes_by_level[program_level].update(course_codes)
+                all_course_codes.update(course_codes)
+            
+            # Levels share no data, so process them concurrently under the shared limiter,
+            # reporting to a single progress bar
+            pbar = tqdm(total=sum(len(courses) for courses in courses_by_level.values()), desc="Processing courses")
+            await asyncio.gather(*[
+                process_level(session, limiter, executor, program_level, levels_to_process[program_level], courses, pbar, args.format)
+                for program_level, courses in courses_by_level.items()
+            ])
+            pbar.close()
     
     # Export metadata JSON files
     folders = [f.name for f in os.scandir(FOLDER_PATH) if f.is_dir()]
@@ -221,8 +484,8 @@ async def main():
         "all": sorted(all_course_codes),
         "by_level": {level: sorted(codes) for level, codes in course_codes_by_level.items() if codes}
     }
-    with open(os.path.join(FOLDER_PATH, "course_codes_by_level.json"), "w") as f:
-        json.dump(course_codes_by_level_data, f, indent=2)
+    with open(os.path.join(FOLDER_PATH, "course_codes_by_level.json"), "wb") as f:
+        f.write(orjson.dumps(course_codes_by_level_data, option=orjson.OPT_INDENT_2))
     
     print(f"\n{'='*60}")
     print(f"Completed! Data saved to {FOLDER_PATH}/{DATE}/")